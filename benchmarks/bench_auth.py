@@ -0,0 +1,34 @@
+# Measures logins per second against the number of AuthService
+# worker processes.
+#   python -m benchmarks.bench_auth [logins] [max workers]
+import os
+import sys
+import time
+
+from main import AuthService, PBKDF2_ITERATIONS, make_password_hash
+
+
+def run(logins, max_workers):
+    passwords = [f"password{i}" for i in range(logins)]
+    # hash a handful of passwords and reuse them; hashing every one
+    # would take as long as the benchmark itself
+    stored = [make_password_hash(password) for password in passwords[:8]]
+    pairs = [(password, stored[i % 8]) for i, password in enumerate(passwords)]
+    print(f"PBKDF2 iterations: {PBKDF2_ITERATIONS}, CPUs: {os.cpu_count()}")
+    print(f"{'workers':>8} {'logins/s':>10}")
+    workers = 1
+    while workers <= max_workers:
+        with AuthService(workers=workers) as service:
+            # start the worker processes before timing
+            service.verify_many(pairs[:workers])
+            start = time.perf_counter()
+            service.verify_many(pairs)
+            elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {logins / elapsed:>10.1f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    run(int(arguments[0]) if arguments else 256,
+        int(arguments[1]) if len(arguments) > 1 else os.cpu_count())
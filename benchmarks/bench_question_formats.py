@@ -0,0 +1,34 @@
+# Compares cold load time and file size of the CSV questions file
+# against the binary question bank.
+#   python -m benchmarks.bench_question_formats [sizes...]
+import os
+import sys
+import tempfile
+
+from main import FileManager
+from benchmarks.common import make_questions, parse_sizes, timed
+
+
+def run(sizes):
+    print(f"{'questions':>10} {'csv MB':>8} {'bin MB':>8} {'csv load s':>11} {'bin load s':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            file_manager = FileManager(profile_file=os.path.join(directory, "profiles.csv"),
+                                       questions_file=os.path.join(directory, "questions.txt"),
+                                       statistics_file=os.path.join(directory, "statistics.txt"))
+            questions = make_questions(size)
+            file_manager.save_questions(questions)
+            file_manager.save_questions_binary(questions)
+            del questions
+            csv_time, loaded = timed(file_manager.load_questions)
+            del loaded
+            binary_time, loaded = timed(file_manager.load_questions_binary)
+            del loaded
+            csv_size = os.path.getsize(file_manager.questions_file) / 1e6
+            binary_size = os.path.getsize(file_manager.questions_binary_file) / 1e6
+            print(f"{size:>10} {csv_size:>8.1f} {binary_size:>8.1f} {csv_time:>11.3f} "
+                  f"{binary_time:>11.3f} {csv_time / binary_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run(parse_sizes(sys.argv[1:]))
@@ -0,0 +1,75 @@
+# Load generator for SessionServer. Starts a server in its own
+# process (one core), then runs many concurrent client sessions
+# against it and reports throughput and request latency.
+#   python -m benchmarks.bench_sessions [sessions] [questions per session] [bank size]
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+
+from main import QuantileSketch, QuestionBank, SessionServer
+from benchmarks.common import make_questions
+
+
+def serve(bank_size, ready):
+    bank = QuestionBank()
+    bank.add_many(make_questions(bank_size))
+
+    async def run():
+        server = SessionServer(bank)
+        host, port = (await server.start())[:2]
+        ready.put((host, port))
+        await server.serve_forever()
+
+    asyncio.run(run())
+
+
+async def client_session(address, questions, latencies):
+    reader, writer = await asyncio.open_connection(*address)
+
+    async def call(request):
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.add(time.perf_counter() - start)
+        return response
+
+    session = (await call({"op": "start", "mode": "quiz"}))["session"]
+    for _ in range(questions):
+        if "done" in await call({"op": "next", "session": session}):
+            break
+        await call({"op": "answer", "session": session, "answer": "answer 1"})
+    await call({"op": "end", "session": session})
+    writer.close()
+
+
+async def generate_load(address, sessions, questions):
+    latencies = QuantileSketch()
+    start = time.perf_counter()
+    await asyncio.gather(*(client_session(address, questions, latencies) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+def run(sessions, questions, bank_size):
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(bank_size, ready), daemon=True)
+    server.start()
+    try:
+        address = ready.get(timeout=600)
+        elapsed, latencies = asyncio.run(generate_load(address, sessions, questions))
+    finally:
+        server.terminate()
+    print(f"bank: {bank_size} questions, {sessions} concurrent sessions x {questions} questions")
+    print(f"requests: {latencies.count}, {latencies.count / elapsed:.0f} requests/s, "
+          f"{sessions / elapsed:.0f} sessions/s")
+    print(f"latency ms: p50 {latencies.quantile(0.5) * 1000:.2f}, "
+          f"p99 {latencies.quantile(0.99) * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    defaults = [1000, 20, 100_000]
+    run(*(arguments + defaults[len(arguments):]))
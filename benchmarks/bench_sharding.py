@@ -0,0 +1,48 @@
+# Answer throughput of ShardedGrader by number of shards, against
+# grading in one process with QuestionBank.grade_answers, and the
+# memory private to each shard process (Linux). Shards are spawned
+# rather than forked, so pages copied from this process do not count
+# as theirs.
+#   python -m benchmarks.bench_sharding [questions] [answers] [max shards]
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+
+from main import FileManager, QuestionBank, ShardedGrader
+from benchmarks.common import make_questions, parse_sizes, timed
+
+
+def run(question_count, answer_count, max_shards):
+    questions = make_questions(question_count)
+    rng = random.Random(1)
+    submissions = []
+    for _ in range(answer_count):
+        question = questions[rng.randrange(question_count)]
+        answer = question.correct_answer if rng.random() < 0.7 else "wrong"
+        submissions.append((f"user{rng.randrange(10_000)}", question.question_id, answer))
+    bank = QuestionBank()
+    bank.add_many(questions)
+    single, _ = timed(bank.grade_answers, ((question_id, answer) for _, question_id, answer in submissions))
+    print(f"{'shards':>7} {'answers/s':>12} {'vs single':>10} {'MiB/shard':>10}")
+    print(f"{'single':>7} {answer_count / single:>12,.0f} {1:>9.2f}x")
+    with tempfile.TemporaryDirectory() as directory:
+        file_manager = FileManager(None, os.path.join(directory, "questions.txt"), None)
+        file_manager.save_questions_binary(questions)
+        shards = 1
+        while shards <= max_shards:
+            with ShardedGrader(file_manager.questions_binary_file, shards=shards,
+                               mp_context=multiprocessing.get_context("spawn")) as grader:
+                # warm up: start the workers and load the snapshot
+                grader.grade(submissions[:shards * 10])
+                elapsed, _ = timed(grader.grade, submissions)
+                memory = max(kib or 0 for kib in grader.private_memory()) / 1024
+            print(f"{shards:>7} {answer_count / elapsed:>12,.0f} {single / elapsed:>9.2f}x {memory:>10.1f}")
+            shards *= 2
+
+
+if __name__ == "__main__":
+    sizes = parse_sizes(sys.argv[1:3], default=(100_000, 1_000_000))
+    max_shards = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+    run(sizes[0], sizes[1], max(max_shards, 1))
@@ -0,0 +1,44 @@
+# Times CLI start-up (process launch to the first question) with and
+# without the cached bank snapshot.
+#   python -m benchmarks.bench_startup [sizes...]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from main import FileManager
+from benchmarks.common import make_questions, parse_sizes
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def start(directory):
+    # quiz --count 0 loads the bank and exits before asking anything
+    begin = time.perf_counter()
+    subprocess.run([sys.executable, MAIN, "--data-dir", directory, "quiz", "--count", "0"],
+                   check=True, stdout=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+    return time.perf_counter() - begin
+
+
+def run(sizes):
+    print(f"{'questions':>10} {'cold s':>8} {'warm s':>8} {'touched s':>10} {'speedup':>8}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            file_manager = FileManager(profile_file=os.path.join(directory, "profiles.csv"),
+                                       questions_file=os.path.join(directory, "questions.txt"),
+                                       statistics_file=os.path.join(directory, "statistics.txt"))
+            file_manager.save_questions(make_questions(size))
+            # cold: no snapshot yet, so the CSV file is parsed (and the
+            # snapshot written)
+            cold = start(directory)
+            warm = start(directory)
+            # touched: mtime changed but content did not, so the
+            # content hash is checked before the snapshot is used
+            os.utime(file_manager.questions_file)
+            touched = start(directory)
+            print(f"{size:>10} {cold:>8.2f} {warm:>8.2f} {touched:>10.2f} {cold / warm:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run(parse_sizes(sys.argv[1:]))
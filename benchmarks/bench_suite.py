@@ -0,0 +1,171 @@
+# Scaling benchmarks for the core paths, run on synthetic banks.
+# Results are written as JSON under results/ and compared with a
+# stored baseline; a scenario slower than the baseline by more than
+# the threshold counts as a regression (exit status 1). Every scenario
+# is run --repeats times on fresh data and the fastest run is kept, so
+# small sizes are not dominated by noise.
+#   python -m benchmarks.bench_suite                  run 1k, 100k, 1M
+#   python -m benchmarks.bench_suite --sizes 1k 100k
+#   python -m benchmarks.bench_suite --threshold 0.5
+#   python -m benchmarks.bench_suite --repeats 9
+#   python -m benchmarks.bench_suite --update-baseline
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+
+from main import FileManager, PracticeScheduler, QuestionBank, QuizManager
+from benchmarks.common import make_questions, parse_sizes, timed
+
+RESULTS_DIRECTORY = "results"
+BASELINE_FILE = os.path.join(RESULTS_DIRECTORY, "benchmark_baseline.json")
+LATEST_FILE = os.path.join(RESULTS_DIRECTORY, "benchmark_latest.json")
+
+
+# Scenarios: each takes a list of questions and returns seconds
+def bank_add(questions):
+    bank = QuestionBank()
+    return timed(lambda: [bank.add_question(question) for question in questions])[0]
+
+
+def bank_fetch(questions):
+    bank = QuestionBank()
+    bank.add_many(questions)
+    ids = [question.question_id for question in questions]
+    return timed(lambda: [bank.fetch_question_by_id(question_id) for question_id in ids])[0]
+
+
+def bank_remove(questions):
+    bank = QuestionBank()
+    bank.add_many(questions)
+    ids = [question.question_id for question in questions]
+    elapsed = timed(lambda: [bank.remove_question(question_id) for question_id in ids])[0]
+    return elapsed
+
+
+def quiz_full(questions):
+    bank = QuestionBank()
+    bank.add_many(questions)
+    quiz = QuizManager(bank)
+
+    def run():
+        quiz.start_quiz(seed=1)
+        while quiz.select_next_question() is not None:
+            pass
+    return timed(run)[0]
+
+
+def check_answer(questions):
+    answers = ["answer 1"] * len(questions)
+    return timed(lambda: list(map(lambda question, answer: question.check_answer(answer),
+                                  questions, answers)))[0]
+
+
+def practice_ordering(questions):
+    for i, question in enumerate(questions):
+        question.times_shown = 3
+        question.times_answered_correctly = i % 4
+
+    def run():
+        scheduler = PracticeScheduler(questions)
+        while scheduler.next_question() is not None:
+            pass
+    return timed(run)[0]
+
+
+def file_save(questions, file_manager):
+    return timed(file_manager.save_questions, questions)[0]
+
+
+def file_load(questions, file_manager):
+    file_manager.save_questions(questions)
+    return timed(file_manager.load_questions)[0]
+
+
+SCENARIOS = [bank_add, bank_fetch, bank_remove, quiz_full, check_answer, practice_ordering]
+FILE_SCENARIOS = [file_save, file_load]
+
+
+def run_suite(sizes, repeats=5):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        file_manager = FileManager(profile_file=os.path.join(directory, "profiles.csv"),
+                                   questions_file=os.path.join(directory, "questions.txt"),
+                                   statistics_file=os.path.join(directory, "statistics.txt"))
+        for size in sizes:
+            for scenario in SCENARIOS + FILE_SCENARIOS:
+                runs = []
+                for _ in range(repeats):
+                    questions = make_questions(size)
+                    if scenario in FILE_SCENARIOS:
+                        runs.append(scenario(questions, file_manager))
+                    else:
+                        runs.append(scenario(questions))
+                elapsed = min(runs)
+                key = f"{scenario.__name__}@{size}"
+                results[key] = elapsed
+                print(f"{key:<28} {elapsed:10.4f} s", flush=True)
+    return results
+
+
+# Returns the list of (key, baseline, current, ratio) that regressed
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, elapsed in results.items():
+        reference = baseline.get(key)
+        if reference:
+            ratio = elapsed / reference
+            if ratio > 1 + threshold:
+                regressions.append((key, reference, elapsed, ratio))
+    return regressions
+
+
+def write_json(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode="w", encoding="utf-8") as file:
+        json.dump({"created": datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(),
+                   "machine": platform.machine(),
+                   "results": results}, file, indent=2)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmarks for the core paths")
+    parser.add_argument("--sizes", nargs="*", default=[], help="bank sizes, e.g. 1k 100k 1M")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="runs per scenario; the fastest one is reported")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--output", default=LATEST_FILE)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    options = parser.parse_args(arguments)
+    if options.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    results = run_suite(parse_sizes(options.sizes, default=(1_000, 100_000, 1_000_000)),
+                        options.repeats)
+    write_json(options.output, results)
+    if options.update_baseline:
+        write_json(options.baseline, results)
+        print(f"Baseline written to {options.baseline}")
+        return 0
+    try:
+        with open(options.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    except FileNotFoundError:
+        print(f"No baseline at {options.baseline}; run with --update-baseline to create one.")
+        return 0
+    regressions = compare(results, baseline, options.threshold)
+    for key, reference, elapsed, ratio in regressions:
+        print(f"REGRESSION {key}: {reference:.4f} s -> {elapsed:.4f} s ({ratio:.2f}x)")
+    if not regressions:
+        print(f"No regressions beyond {options.threshold:.0%} of the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# Shared helpers for the benchmark scripts.
+# Run the benchmarks from the repository root, e.g.
+#   python -m benchmarks.bench_question_formats
+import random
+import time
+
+from main import Question
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+# Parse sizes from the command line ("10k", "1M" or plain numbers)
+def parse_sizes(arguments, default=SIZES):
+    if not arguments:
+        return default
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    sizes = []
+    for argument in arguments:
+        suffix = argument[-1].lower()
+        if suffix in multipliers:
+            sizes.append(int(argument[:-1]) * multipliers[suffix])
+        else:
+            sizes.append(int(argument))
+    return sizes
+
+
+# Build a synthetic bank of n questions; every third question is
+# multiple-choice
+def make_questions(n, seed=0):
+    rng = random.Random(seed)
+    words = ["capital", "river", "planet", "element", "author", "year",
+             "language", "ocean", "mountain", "country", "painter", "war"]
+    questions = []
+    for i in range(n):
+        text = f"What is the {rng.choice(words)} of {rng.choice(words)} number {i}?"
+        answer = f"answer {rng.randrange(1000)}"
+        options = [answer, f"answer {rng.randrange(1000)}", f"answer {rng.randrange(1000)}"] \
+            if i % 3 == 0 else None
+        questions.append(Question(f"Q{i}", text, answer, options=options))
+    return questions
+
+
+# Time a callable, returning (seconds, result)
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
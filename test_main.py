@@ -1,5 +1,17 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
 import pytest
-from main import Question, QuestionBank
+from main import (Question, QuestionBank, QuizManager, PracticeScheduler, PracticeTestSession,
+                  FileManager, AuthService, UserProfile, ProfileStore, UserStatistics,
+                  StatisticsJournal, StatisticsSummary, QuantileSketch, SessionServer,
+                  IndexableSkipList, Leaderboards, AnswerMatcher, SearchIndex,
+                  QuestionDeduplicator, ParallelImporter, Metrics, BankSnapshotCache,
+                  QuestionBankLog, FormGenerator, ResponseLog, ItemAnalysis, ShardedGrader, main,
+                  check_password_hash, legacy_password_hash)
 from unittest.mock import MagicMock
 
 
@@ -35,6 +47,876 @@ def test_enable_disable_questions():
 
 
 def test_add_question(question_bank):
-    question = MagicMock()
+    question = MagicMock(_bank=None)
     question_bank.add_question(question)
     assert question in question_bank.questions
+
+
+def test_question_belongs_to_one_bank(question_bank):
+    question = Question("1", "What is the capital of France?", "Paris")
+    question_bank.add_question(question)
+    other = QuestionBank()
+    with pytest.raises(ValueError):
+        other.add_question(question)
+    with pytest.raises(ValueError):
+        other.add_many([Question("2", "Question 2", "yes"), question])
+    assert len(other) == 0
+    question_bank.remove_question("1")
+    other.add_question(question)
+    assert other.remove_question("1") is question
+
+
+def test_fetch_and_remove_question(question_bank):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(5)])
+    assert question_bank.fetch_question_by_id("3").question_text == "Question 3"
+    question_bank.remove_many(["1", "3"])
+    assert question_bank.fetch_question_by_id("3") is None
+    assert [q.question_id for q in question_bank.questions] == ["0", "2", "4"]
+
+
+def test_active_inactive_views(question_bank):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(3)])
+    question_bank.enable_disable_question("1", enable=False)
+    assert question_bank.inactive_count == 1
+    assert [q.question_id for q in question_bank.active_questions()] == ["0", "2"]
+    # toggling the question directly keeps the bank in sync
+    question_bank.fetch_question_by_id("1").enable()
+    assert question_bank.is_active("1")
+    assert question_bank.active_count == 3
+    assert [q.question_id for q in question_bank.active_questions()] == ["0", "1", "2"]
+    for question_id in ("2", "0"):
+        question_bank.enable_disable_question(question_id, enable=False)
+    assert [q.question_id for q in question_bank.inactive_questions()] == ["0", "2"]
+    question_bank.add_question(Question("3", "Question 3", "yes"))
+    question_bank.enable_disable_question("0")
+    assert [q.question_id for q in question_bank.active_questions()] == ["0", "1", "3"]
+    question_bank.remove_question("1")
+    assert [q.question_id for q in question_bank.active_questions()] == ["0", "3"]
+    disabled = Question("5", "Question 5", "yes")
+    disabled.disable()
+    question_bank.add_many([Question("4", "Question 4", "yes"), disabled])
+    assert [q.question_id for q in question_bank.inactive_questions()] == ["2", "5"]
+    assert [q.question_id for q in question_bank.active_questions()] == ["0", "3", "4"]
+    # the views are read-only snapshots
+    questions = question_bank.questions
+    with pytest.raises(AttributeError):
+        questions.append(Question("6", "Question 6", "yes"))
+    assert question_bank.questions is questions
+    # iterating the bank follows edits without building a view
+    question_bank.remove_question("3")
+    assert [q.question_id for q in question_bank] == ["0", "2", "4", "5"]
+    assert len(question_bank) == 4 and "3" not in question_bank
+
+
+def test_quiz_draws_each_active_question_once(question_bank):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(50)])
+    question_bank.enable_disable_question("7", enable=False)
+    quiz = QuizManager(question_bank)
+    drawn = [quiz.start_quiz(seed=1)]
+    # disabling a question mid-quiz also takes it out of the draw
+    question_bank.enable_disable_question("8", enable=False)
+    while (question := quiz.select_next_question()) is not None:
+        drawn.append(question)
+    drawn_ids = {q.question_id for q in drawn}
+    assert len(drawn) == len(drawn_ids)
+    assert "7" not in drawn_ids
+    assert len(drawn_ids) >= 48
+
+
+def test_quiz_seed_is_reproducible(question_bank):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(20)])
+    orders = []
+    for _ in range(2):
+        quiz = QuizManager(question_bank)
+        quiz.start_quiz(seed=42, weights={"0": 5, "1": 0})
+        while quiz.select_next_question() is not None:
+            pass
+        orders.append([q.question_id for q in quiz.questions_used])
+    assert orders[0] == orders[1]
+    assert "1" not in orders[0]
+
+
+def test_practice_scheduler_orders_by_accuracy():
+    questions = [Question(str(i), f"Question {i}", "yes") for i in range(3)]
+    for question, correct in zip(questions, (2, 0, 1)):
+        question.times_shown = 2
+        question.times_answered_correctly = correct
+    scheduler = PracticeScheduler(questions)
+    assert [scheduler.next_question().question_id for _ in range(3)] == ["1", "2", "0"]
+    assert scheduler.next_question() is None
+
+
+def test_practice_mode_repeats_wrong_answers(capsys):
+    questions = [Question(str(i), f"Question {i}", "yes") for i in range(2)]
+    session = PracticeTestSession(questions)
+    session.start_practice_mode()
+    first = session.next_question()
+    session.check_answer("no")
+    second = session.next_question()
+    session.check_answer("yes")
+    # the wrong answer is due again before the correct one
+    assert session.next_question() is first
+    assert second is not first
+
+
+@pytest.fixture
+def file_manager(tmp_path):
+    return FileManager(profile_file=str(tmp_path / "profiles.csv"),
+                       questions_file=str(tmp_path / "questions.txt"),
+                       statistics_file=str(tmp_path / "statistics.txt"))
+
+
+def test_stream_questions(file_manager):
+    file_manager.save_questions([Question(str(i), f"Question {i}", "yes", options=["yes", "no"]) for i in range(3)])
+    questions = file_manager.load_questions(stream=True)
+    first = next(questions)
+    assert (first.question_id, first.options) == ("0", ["yes", "no"])
+    assert [q.question_id for q in questions] == ["1", "2"]
+
+
+def test_fetch_question_from_index(file_manager):
+    file_manager.save_questions([
+        Question("1", "Plain question", "yes"),
+        Question("2", "Spans\nseveral \"quoted\"\nlines", "no"),
+        Question("3", "Last question", "maybe"),
+    ])
+    assert file_manager.fetch_question("2").question_text == "Spans\nseveral \"quoted\"\nlines"
+    assert file_manager.fetch_question("3").correct_answer == "maybe"
+    assert file_manager.fetch_question("4") is None
+    # the index is rebuilt when the questions file changes
+    file_manager.save_questions([Question("4", "New question", "yes")])
+    assert file_manager.fetch_question("4").question_text == "New question"
+    assert file_manager.fetch_question("1") is None
+
+
+def test_binary_bank_round_trip(file_manager):
+    questions = [Question(str(i), f"Question {i}", "yes", options=["yes", "no"] if i % 2 else None)
+                 for i in range(5)]
+    questions[3].disable()
+    file_manager.save_questions(questions)
+    file_manager.convert_questions_to_binary()
+    loaded = file_manager.load_questions_binary()
+    assert [(q.question_id, q.question_text, q.correct_answer, q.options) for q in loaded] == \
+        [(q.question_id, q.question_text, q.correct_answer, q.options or []) for q in questions]
+    # CSV -> binary -> CSV is lossless
+    with open(file_manager.questions_file, encoding="utf-8") as file:
+        original = file.read()
+    file_manager.convert_questions_from_binary()
+    with open(file_manager.questions_file, encoding="utf-8") as file:
+        assert file.read() == original
+    # the binary format also keeps the active status
+    file_manager.save_questions_binary(questions)
+    assert file_manager.load_questions_binary()[3].active is False
+    assert file_manager.fetch_question_binary("4").question_text == "Question 4"
+    assert file_manager.fetch_question_binary("9") is None
+    for question in questions:
+        fetched = file_manager.fetch_question_binary(question.question_id)
+        assert (fetched.question_text, fetched.correct_answer, fetched.options, fetched.active) == \
+            (question.question_text, question.correct_answer, question.options or [], question.active)
+    assert file_manager.fetch_question_binary("") is None
+    assert file_manager.fetch_question_binary("zz") is None
+
+
+def test_statistics_live_in_bank_columns(question_bank):
+    question = Question("1", "What is the capital of France?", "Paris")
+    question.check_answer("Paris")
+    question_bank.add_question(question)
+    question.check_answer("Lyon")
+    slot = question._slot
+    assert question_bank.statistics.times_shown[slot] == 2
+    assert question_bank.statistics.times_answered_correctly[slot] == 1
+    # counters go back to the question when it leaves the bank
+    question_bank.remove_question("1")
+    assert (question.times_shown, question.times_answered_correctly) == (2, 1)
+
+
+def test_statistics_reports(question_bank):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(4)])
+    for question_id, answers in (("0", ["yes", "yes"]), ("1", ["no"]), ("2", ["yes", "no", "no"])):
+        for answer in answers:
+            question_bank.fetch_question_by_id(question_id).check_answer(answer)
+    statistics = question_bank.statistics
+    assert statistics.accuracy() == {"0": 1.0, "1": 0.0, "2": 1 / 3}
+    assert statistics.least_practised(2) == ["3", "1"]
+    assert statistics.top_k(1, lowest=True) == [("1", 0.0)]
+    assert statistics.totals() == (6, 3)
+
+
+def test_grade_answers_matches_check_answer():
+    answers = [("0", "Yes"), ("1", "no"), ("0", "yes "), ("2", "MAYBE"), ("0", "yes")]
+    single_bank, batch_bank = QuestionBank(), QuestionBank()
+    for bank in (single_bank, batch_bank):
+        bank.add_many([Question(str(i), f"Question {i}", answer)
+                       for i, answer in enumerate(["yes", "No", "maybe"])])
+    expected = [single_bank.fetch_question_by_id(question_id).check_answer(answer)
+                for question_id, answer in answers]
+    results = batch_bank.grade_answers(answers)
+    assert list(results) == [int(correct) for correct in expected]
+    assert list(batch_bank.statistics.times_shown) == list(single_bank.statistics.times_shown)
+    assert list(batch_bank.statistics.times_answered_correctly) == \
+        list(single_bank.statistics.times_answered_correctly)
+    with pytest.raises(KeyError):
+        batch_bank.grade_answers([("0", "yes"), ("9", "yes")])
+    assert batch_bank.statistics.times_shown[0] == 3
+
+
+def test_evaluate_answers(question_bank):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(3)])
+    quiz = QuizManager(question_bank)
+    questions = question_bank.questions
+    quiz.evaluate_answer(questions[0], "yes")
+    quiz.evaluate_answers([(questions[1], "yes"), (questions[2], "no")])
+    assert quiz.calculate_final_score() == 2
+    assert [correct for _, correct in quiz.questions_answered] == [True, True, False]
+
+
+@pytest.fixture
+def auth_service():
+    service = AuthService(workers=2, iterations=1000)
+    yield service
+    service.close()
+
+
+def test_auth_service_hash_and_verify(auth_service):
+    stored_hash = auth_service.hash_password("secret")
+    assert stored_hash.startswith("pbkdf2_sha256$1000$")
+    assert auth_service.verify_password("secret", stored_hash)
+    assert not asyncio.run(auth_service.verify_password_async("wrong", stored_hash))
+    legacy_hash = legacy_password_hash("secret")
+    results = auth_service.verify_and_rehash_many([("secret", legacy_hash), ("wrong", legacy_hash),
+                                                   ("secret", stored_hash)])
+    assert [valid for valid, _ in results] == [True, False, True]
+    assert results[0][1].startswith("pbkdf2_sha256$") and results[2][1] is None
+    # values that are not hashes never match, and never raise
+    for damaged in ("pässwörd", "", "pbkdf2_sha256$0$ab$cd", "pbkdf2_sha256$10$abc$cd",
+                    "sha1$10$ab$cd", stored_hash + "$"):
+        assert not check_password_hash("secret", damaged)
+
+
+def test_migrate_legacy_hashes(auth_service, tmp_path):
+    profiles_file = tmp_path / "profiles.csv"
+    profiles_file.write_text("Username,Email,Age,Password\n"
+                             f"john_doe,john@example.com,30,{legacy_password_hash('secret')}\n")
+    assert auth_service.migrate_profiles_file(profiles_file) == 1
+    migrated_hash = profiles_file.read_text().splitlines()[1].split(",")[-1]
+    assert migrated_hash.startswith("pbkdf2_sha256_legacy$")
+    assert check_password_hash("secret", migrated_hash)
+    assert auth_service.migrate_profiles_file(profiles_file) == 0
+
+
+def test_login_upgrades_legacy_hash(auth_service, monkeypatch, capsys):
+    user = UserProfile(username="john_doe", email="john@example.com", age=30, password="secret")
+    monkeypatch.setattr(UserProfile, "auth_service", auth_service)
+    assert user.login("john_doe", "secret")
+    assert user.password.startswith("pbkdf2_sha256$1000$")
+    assert user.login("john_doe", "secret")
+    assert not user.login("john_doe", "wrong")
+
+
+def test_email_is_validated():
+    with pytest.raises(ValueError):
+        UserProfile(username="john_doe", email="invalid_email", age=30, password="secret")
+
+
+def test_profile_store(tmp_path):
+    with ProfileStore(str(tmp_path / "profiles.db")) as store:
+        store.save_many([
+            UserProfile(username="john_doe", email="john@example.com", age=30, password="secret"),
+            UserProfile(username="jane_smith", email="jane@example.com", age=25, password="secret"),
+        ])
+        store.save(UserProfile(username="john_doe", email="john@example.org", age=31, password="new"))
+        assert len(store) == 2
+        john = store.get("john_doe")
+        assert (john.email, john.age) == ("john@example.org", 31)
+        assert john.verify_password("new")
+        assert [p.username for p in store.get_by_email("jane@example.com")] == ["jane_smith"]
+        assert store.get("nobody") is None
+
+
+def test_profile_store_csv_round_trip(tmp_path, file_manager):
+    file_manager.save_profiles([UserProfile(username="john_doe", email="john@example.com",
+                                            age=30, password="secret")])
+    with ProfileStore(":memory:") as store:
+        assert store.import_csv(file_manager.profiles_file) == 1
+        store.export_csv(str(tmp_path / "exported.csv"))
+    with open(file_manager.profiles_file) as original, open(tmp_path / "exported.csv") as exported:
+        assert exported.read() == original.read()
+    [john] = file_manager.load_profiles()
+    assert john.verify_password("secret")
+
+
+def test_statistics_journal_survives_crash(file_manager, question_bank):
+    question_bank.add_question(Question("1", "What is the capital of France?", "Paris"))
+    journal = StatisticsJournal(file_manager, flush_size=2, flush_interval=60)
+    question_bank.journal = journal
+    user_statistics = UserStatistics("john_doe", journal=journal)
+    question_bank.fetch_question_by_id("1").check_answer("Paris")
+    user_statistics.update_correct_answer_count()
+    question_bank.grade_answers([("1", "Lyon")])
+    # simulate a crash mid-write: the torn line is dropped, the rest is replayed
+    with open(journal.path, "a") as file:
+        file.write('[99, "add", "torn')
+    recovered = StatisticsJournal(file_manager)
+    assert recovered.statistics == {"question.1.times_shown": 2,
+                                    "question.1.times_answered_correctly": 1,
+                                    "user.john_doe.correct_answers": 1}
+    recovered.add("question.1.times_shown")
+    recovered.compact()
+    recovered.close()
+    assert file_manager.load_statistics()["question.1.times_shown"] == "3"
+    assert StatisticsJournal(file_manager).statistics["question.1.times_shown"] == 3
+
+
+def test_statistics_journal_flushes_idle_and_journals_resets(file_manager):
+    journal = StatisticsJournal(file_manager, flush_size=100, flush_interval=0.05, compact_size=3)
+    user_statistics = UserStatistics("john_doe", journal=journal)
+    user_statistics.update_correct_answer_count()
+    # no further updates: the timer writes the pending entry
+    deadline = time.monotonic() + 2
+    while not os.path.getsize(journal.path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert StatisticsJournal(file_manager, read_only=True).statistics == {
+        "user.john_doe.correct_answers": 1}
+    user_statistics.update_score("t1", 90)
+    user_statistics.reset_statistics()
+    journal.add("question.1.times_shown")
+    # the third entry starts a compaction in the background
+    journal.flush()
+    journal.close()
+    assert not os.path.exists(journal.compacting_path)
+    statistics = StatisticsJournal(file_manager, read_only=True).statistics
+    assert not any(metric.startswith("user.john_doe.") for metric in statistics)
+    assert statistics["question.1.times_shown"] == 1
+
+
+def test_user_statistics_running_aggregates():
+    user_statistics = UserStatistics("john_doe")
+    for test_id, score in enumerate([70, 80, 90, 100]):
+        user_statistics.update_score(test_id, score)
+    # overwriting a score replaces it in the aggregates
+    user_statistics.update_score(3, 60)
+    assert user_statistics.calculate_average_score() == pytest.approx(75)
+    assert user_statistics.score_variance() == pytest.approx(statistics.pvariance([70, 80, 90, 60]))
+
+
+def test_quantile_sketch_is_mergeable():
+    rng = random.Random(0)
+    values = [rng.lognormvariate(3, 1) for _ in range(10_000)]
+    shards = [QuantileSketch() for _ in range(4)]
+    for i, value in enumerate(values):
+        shards[i % 4].add(value)
+    merged = QuantileSketch()
+    for shard in shards:
+        merged.merge(shard)
+    median = statistics.median(values)
+    assert merged.quantile(0.5) == pytest.approx(median, rel=0.02)
+
+
+def test_statistics_summaries_merge():
+    users = [UserStatistics(f"user{i}") for i in range(3)]
+    for i, user_statistics in enumerate(users):
+        user_statistics.update_score("test", 50 + 10 * i)
+        user_statistics.record_completion_time("test", 30 + i)
+        user_statistics.update_correct_answer_count()
+    users[0].update_incorrect_answer_count()
+    combined = StatisticsSummary.combine(user.summary() for user in users)
+    assert combined.scores.mean == pytest.approx(60)
+    assert combined.completion_times.count == 3
+    assert combined.accuracy == pytest.approx(3 / 4)
+
+
+def test_session_server_handles_requests(question_bank):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(3)])
+    server = SessionServer(question_bank, idle_timeout=60)
+    session = server.handle_request({"op": "start", "mode": "quiz", "seed": 1})["session"]
+    answers = []
+    while "question_id" in server.handle_request({"op": "next", "session": session}):
+        answers.append(server.handle_request({"op": "answer", "session": session, "answer": "yes"}))
+    assert [answer["score"] for answer in answers] == [1, 2, 3]
+    practice = server.handle_request({"op": "start", "mode": "practice", "size": 2})["session"]
+    assert len(server.sessions[practice].scheduler) == 2
+    server.sessions[practice].last_seen -= 120
+    assert server.evict_idle_sessions() == 1
+    assert "error" in server.handle_request({"op": "next", "session": practice})
+    assert server.handle_request({"op": "end", "session": session}) == {"score": 3, "answered": 3}
+
+
+def test_session_server_over_socket(question_bank):
+    question_bank.add_question(Question("1", "What is the capital of France?", "Paris"))
+
+    async def run():
+        server = SessionServer(question_bank)
+        host, port = (await server.start())[:2]
+        reader, writer = await asyncio.open_connection(host, port)
+        responses = []
+        for request in ({"op": "start"}, {"op": "next", "session": "1"}, [1, 2],
+                        {"op": "next", "session": [1]},
+                        {"op": "answer", "session": "1", "answer": "paris"},
+                        b'{"op": "start", "mode": "practice", "size": 1e400}',
+                        {"op": "start", "mode": "practice", "size": "5"},
+                        {"op": "start", "mode": "practice", "size": 1}):
+            line = request if isinstance(request, bytes) else json.dumps(request).encode()
+            writer.write(line + b"\n")
+            responses.append(json.loads(await reader.readline()))
+        writer.close()
+        await server.close()
+        return responses
+
+    responses = asyncio.run(run())
+    assert responses[1]["question_text"] == "What is the capital of France?"
+    # malformed requests get an error and the connection stays open
+    assert "error" in responses[2] and "error" in responses[3]
+    assert responses[4] == {"correct": True, "score": 1}
+    # a size that is not a positive integer is refused, also when it
+    # overflows to infinity
+    assert "error" in responses[5] and "error" in responses[6]
+    assert responses[7] == {"session": "2"}
+
+
+def test_indexable_skip_list():
+    rng = random.Random(0)
+    values = rng.sample(range(10_000), 2_000)
+    skip_list = IndexableSkipList(seed=1)
+    for value in values:
+        skip_list.insert(value)
+    for value in values[::2]:
+        skip_list.remove(value)
+    expected = sorted(values[1::2])
+    assert list(skip_list) == expected
+    assert skip_list[500] == expected[500]
+    assert skip_list.rank(expected[700]) == 700
+    with pytest.raises(KeyError):
+        skip_list.remove(values[0])
+
+
+def test_leaderboards(file_manager):
+    leaderboards = Leaderboards()
+    users = {name: UserStatistics(name, leaderboards=leaderboards) for name in ("ann", "bob", "cy", "dee")}
+    for name, score in (("ann", 70), ("bob", 90), ("cy", 80), ("dee", 60)):
+        users[name].update_score("test1", score)
+    users["dee"].update_score("test2", 100)
+    assert leaderboards.board("test1").top(2) == [(1, "bob", 90), (2, "cy", 80)]
+    assert leaderboards.board().rank("dee") == 3
+    assert [user for _, user, _ in leaderboards.board().around("cy", radius=1)] == ["bob", "cy", "dee"]
+    file_manager.save_leaderboards(leaderboards)
+    loaded = file_manager.load_leaderboards()
+    assert loaded.board("test1").top(4) == leaderboards.board("test1").top(4)
+    assert loaded.board().rank("ann") == 4
+    # integer test IDs find the same board after a save and load
+    users["ann"].update_score(3, 50)
+    file_manager.save_leaderboards(leaderboards)
+    loaded = file_manager.load_leaderboards()
+    assert loaded.board(3).top(1) == [(1, "ann", 50)] and len(loaded.tests) == 3
+    users["bob"].reset_statistics()
+    assert leaderboards.board("test1").rank("bob") is None
+    assert leaderboards.board().rank("bob") is None
+
+
+def test_tolerant_answer_matching():
+    question = Question("1", "Who wrote Hamlet?", "William Shakespeare")
+    assert not question.check_answer("william shakespear")
+    question.set_matcher(AnswerMatcher(max_distance=1), alternatives=["Shakespeare"])
+    assert question.check_answer("william  shakespear")
+    assert question.check_answer("Shakespeare!")
+    assert question.check_answer("shakespere")
+    assert not question.check_answer("Marlowe")
+    # repeated answers are served from the cache
+    assert not question.check_answer("Marlowe")
+    assert question.times_answered_correctly == 3
+    question.correct_answer = "Christopher Marlowe"
+    assert question.check_answer("christopher marlow")
+
+
+def test_short_answers_match_exactly():
+    question = Question("1", "What is 2 + 2?", "4")
+    question.set_matcher(AnswerMatcher(max_distance=2))
+    assert question.check_answer("4")
+    assert not question.check_answer("5")
+    assert not question.check_answer("44")
+    question = Question("2", "What is 6 * 7 * 300?", "12600")
+    question.set_matcher(AnswerMatcher(max_distance=2))
+    # five characters allow a single edit
+    assert question.check_answer("12601")
+    assert not question.check_answer("12611")
+
+
+def test_grade_answers_uses_matcher(question_bank):
+    question_bank.add_question(Question("1", "Who wrote Hamlet?", "Shakespeare"))
+    question_bank.fetch_question_by_id("1").set_matcher(AnswerMatcher(max_distance=2))
+    results = question_bank.grade_answers([("1", "shakespeare"), ("1", "Shakspear"), ("1", "Marlowe")])
+    assert list(results) == [1, 1, 0]
+
+
+def test_search_index_follows_bank(question_bank):
+    question_bank.add_many([
+        Question("1", "What is the capital of France?", "Paris"),
+        Question("2", "What is the capital of Italy? Name the capital city.", "Rome"),
+        Question("3", "Which river flows through Paris?", "Seine", options=["Seine", "Thames"]),
+    ])
+    index = SearchIndex().attach(question_bank)
+    assert [question_id for question_id, _ in index.search("capital")] == ["2", "1"]
+    assert [question_id for question_id, _ in index.search("thames")] == ["3"]
+    assert {question_id for question_id, _ in index.search("what capi", prefix=True)} == {"1", "2"}
+    question_bank.fetch_question_by_id("1").question_text = "What is the largest city in France?"
+    question_bank.remove_question("2")
+    question_bank.add_question(Question("4", "Capital of Spain?", "Madrid"))
+    assert [question_id for question_id, _ in index.search("capital")] == ["4"]
+    assert index.complete("c") == ["capital", "city"]
+
+
+def test_search_index_prunes_common_tokens(question_bank):
+    question_bank.add_many(Question(str(i), f"What is item number {i}?", f"answer {i % 7}")
+                           for i in range(300))
+    index = SearchIndex().attach(question_bank)
+    # "what" is in every question: a stop word, dropped only when the
+    # query has rarer terms
+    assert len(index.search("what", limit=500)) == 300
+    assert [question_id for question_id, _ in index.search("what is number 42")][0] == "42"
+    # a common topic is still found
+    question_bank.add_many(Question(f"f{i}", f"Where in France is city {i}?", "x") for i in range(320))
+    index = SearchIndex().attach(question_bank)
+    assert len(index.search("france", limit=1000)) == 320
+    # pruned search keeps the same ranking as scoring every posting
+    question_bank.add_many(Question(f"x{i}", f"Number {i} twice, number {i}", "x") for i in range(5))
+    index = SearchIndex().attach(question_bank)
+    full = index.search("number 3 twice", limit=len(index))
+    assert index.search("number 3 twice", limit=3) == full[:3]
+
+
+def test_search_index_persists(file_manager, question_bank):
+    question_bank.add_question(Question("1", "What is the capital of France?", "Paris"))
+    index = SearchIndex().attach(question_bank)
+    file_manager.save_search_index(index)
+    assert file_manager.load_search_index().search("france") == index.search("france")
+
+
+def test_deduplicate_on_import(file_manager, question_bank):
+    deduplicator = QuestionDeduplicator()
+    report = deduplicator.import_questions(question_bank, [
+        Question("1", "What is the capital city of France?", "Paris"),
+        Question("2", "Which river flows through the city of Paris?", "Seine"),
+    ])
+    assert report.added == ["1", "2"]
+    duplicate = Question("9", "What is the capital city of France ?", "paris")
+    duplicate.times_shown, duplicate.times_answered_correctly = 4, 3
+    report = deduplicator.import_questions(question_bank, [
+        duplicate,
+        Question("10", "What is the capital city of Germany?", "Berlin"),
+    ])
+    assert [(kept, merged) for kept, merged, _ in report.merged] == [("1", "9")]
+    assert report.added == ["10"]
+    assert question_bank.fetch_question_by_id("1").times_shown == 4
+    assert "9 merged into 1" in report.lines()[1]
+    # persisted signatures let a later import skip rows it has seen
+    file_manager.save_signatures(deduplicator)
+    report = file_manager.load_signatures().import_questions(
+        question_bank, [question_bank.fetch_question_by_id("2")], merge=False)
+    assert report.skipped == ["2"]
+    # re-importing a changed question keeps its answer counts
+    question_bank.fetch_question_by_id("2").check_answer("Seine")
+    report = deduplicator.import_questions(
+        question_bank, [Question("2", "Which river flows through Paris, France?", "Seine")])
+    assert report.added == ["2"]
+    changed = question_bank.fetch_question_by_id("2")
+    assert (changed.times_shown, changed.times_answered_correctly) == (1, 1)
+    deduplicator.remove("2")
+    assert "2" not in deduplicator.signatures
+
+
+def test_reimporting_a_file_merges_duplicates_once(file_manager, question_bank):
+    file_manager.save_questions([Question("1", "What is the capital city of France?", "Paris"),
+                                 Question("9", "What is the capital city of France ?", "paris")])
+
+    def load():
+        questions = file_manager.load_questions()
+        questions[1].times_shown, questions[1].times_answered_correctly = 4, 3
+        return questions
+    deduplicator = QuestionDeduplicator()
+    report = deduplicator.import_questions(question_bank, load())
+    assert [merged for _, merged, _ in report.merged] == ["9"]
+    assert question_bank.fetch_question_by_id("1").times_shown == 4
+    # the merge is remembered, also across a save and load
+    for _ in range(2):
+        file_manager.save_signatures(deduplicator)
+        deduplicator = file_manager.load_signatures()
+        report = deduplicator.import_questions(question_bank, load())
+        assert report.skipped == ["1", "9"] and not report.merged
+        assert question_bank.fetch_question_by_id("1").times_shown == 4
+
+
+def test_parallel_question_import(file_manager):
+    questions = [Question(str(i), f"Question {i}\nwith a \"quoted\" second line", "yes", options=["yes", "no"])
+                 for i in range(200)]
+    file_manager.save_questions(questions)
+    with open(file_manager.questions_file, "a", newline="") as file:
+        file.write("bad,,yes,\n")
+    result = ParallelImporter(workers=2, chunk_size=500).import_questions(file_manager.questions_file)
+    assert [q.question_id for q in result.items] == [str(i) for i in range(200)]
+    assert result.items[7].question_text == questions[7].question_text
+    assert result.errors == [(202, "question_text cannot be empty")]
+
+
+def test_parallel_import_recovers_from_stray_quote(file_manager):
+    file_manager.save_questions([Question(str(i), f"Question {i}", "yes") for i in range(30000)])
+    with open(file_manager.questions_file, "r+", newline="") as file:
+        lines = file.readlines()
+        lines[11] = '10,Question "10,yes,\n'
+        file.seek(0)
+        file.writelines(lines)
+    start = time.perf_counter()
+    result = ParallelImporter(workers=1, chunk_size=1000).import_questions(file_manager.questions_file)
+    assert time.perf_counter() - start < 10
+    assert result.errors == [(12, "unterminated quoted field")]
+    assert len(result.items) == 29999
+
+
+def test_parallel_profile_import(file_manager):
+    file_manager.save_profiles([UserProfile(username="john_doe", email="john@example.com",
+                                            age=30, password="secret")])
+    with open(file_manager.profiles_file, "a", newline="") as file:
+        file.write("jane_smith,jane@example.com,25,plaintext\n")
+        file.write("bad_email,not-an-email,25,secret\n")
+        file.write("bad_age,ok@example.com,-1,secret\n")
+        file.write("ann,ann@example.com,30,pa$$word\n")
+    with open(file_manager.profiles_file, "ab") as file:
+        file.write(b"bad_bytes,\xff@example.com,30,secret\n")
+        file.write(b"bob,bob@example.com,40,secret\n")
+    result = ParallelImporter(workers=2, chunk_size=64).import_profiles(file_manager.profiles_file)
+    assert [profile.username for profile in result.items] == ["john_doe", "jane_smith", "ann", "bob"]
+    assert result.items[0].verify_password("secret")
+    assert result.items[1].verify_password("plaintext")
+    # a "$" in a plain-text password does not make it a hash
+    assert result.items[2].verify_password("pa$$word")
+    assert [row for row, _ in result.errors] == [4, 5, 7]
+
+
+def test_metrics_wrap_and_restore(question_bank, tmp_path):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(3)])
+    original = Question.check_answer
+    metrics = Metrics()
+    metrics.enable()
+    try:
+        quiz = QuizManager(question_bank)
+        question = quiz.start_quiz(seed=1)
+        quiz.evaluate_answer(question, "yes")
+    finally:
+        metrics.disable()
+    assert Question.check_answer is original
+    assert metrics.histograms["question_check_answer"].count == 1
+    assert metrics.histograms["quiz_select_next_question"].count == 1
+    prometheus = open(metrics.dump(str(tmp_path))).read()
+    assert 'learning_tool_quiz_evaluate_answer_seconds_bucket{le="+Inf"} 1' in prometheus
+    snapshot = json.load(open(metrics.dump(str(tmp_path), format="json")))
+    assert snapshot["histograms"]["question_check_answer"]["count"] == 1
+    assert snapshot["counters"]["quiz_evaluate_answer"] == 1
+    assert "learning_tool_question_check_answer_total 1" in prometheus
+    paths = {metrics.dump(str(tmp_path)) for _ in range(3)}
+    assert len(paths) == 3
+
+
+def test_metrics_single_active_instance():
+    original = Question.check_answer
+    first, second = Metrics(), Metrics()
+    first.enable()
+    try:
+        with pytest.raises(RuntimeError):
+            second.enable()
+        second.disable()
+        assert Question.check_answer is not original
+    finally:
+        first.disable()
+    assert Question.check_answer is original
+    second.enable()
+    second.disable()
+    assert Question.check_answer is original
+
+
+def test_sampling_profiler(tmp_path):
+    metrics = Metrics()
+    profiler = metrics.start_profiler(interval=0.001)
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    stacks = profiler.stop()
+    assert any("test_sampling_profiler" in stack for stack in stacks)
+    assert open(profiler.dump(str(tmp_path / "profile.txt"))).read()
+
+
+def test_bank_snapshot_cache(file_manager):
+    file_manager.save_questions([Question(str(i), f"Question {i}", "yes") for i in range(3)])
+    cache = BankSnapshotCache(file_manager)
+    assert len(cache.load_bank()) == 3 and not cache.hit
+    assert len(cache.load_bank()) == 3 and cache.hit
+    # a touched but unchanged file is recognised by its content hash
+    os.utime(file_manager.questions_file, ns=(0, 0))
+    assert len(cache.load_bank()) == 3 and cache.hit
+    file_manager.save_questions([Question("9", "Question 9", "no")])
+    bank = cache.load_bank()
+    assert not cache.hit and bank.fetch_question_by_id("9").correct_answer == "no"
+
+
+def test_cli_commands(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "new.csv"
+    FileManager(None, str(source), None).save_questions(
+        [Question("1", "What is the capital of France?", "Paris")])
+    assert main(["--data-dir", str(tmp_path), "import", str(source)]) == 0
+    data = FileManager(None, str(tmp_path / "questions.txt"), None)
+    with QuestionBankLog(data) as log:
+        assert "1" in log.open_bank()
+    answers = iter(["paris"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    assert main(["--data-dir", str(tmp_path), "quiz"]) == 0
+    assert "Your final score is: 1/1" in capsys.readouterr().out
+    journal_file = tmp_path / "statistics.txt.journal"
+    journal_size = journal_file.stat().st_size
+    main(["--data-dir", str(tmp_path), "stats"])
+    assert "question.1.times_answered_correctly: 1" in capsys.readouterr().out
+    # stats only reads the journal
+    assert journal_file.stat().st_size == journal_size
+    # the next session starts from the recorded answer history
+    bank = BankSnapshotCache(data).load_bank()
+    StatisticsJournal(FileManager(None, None, str(tmp_path / "statistics.txt")),
+                      read_only=True).restore_counts(bank)
+    assert bank.fetch_question_by_id("1").times_answered_correctly == 1
+
+
+def test_question_bank_log_replay_and_compaction(file_manager):
+    file_manager.save_questions([Question(str(i), f"Question {i}", "yes") for i in range(3)])
+    with QuestionBankLog(file_manager, compact_size=100) as log:
+        bank = log.open_bank()
+        bank.add_question(Question("3", "Question 3", "no", options=["yes", "no"]))
+        bank.remove_question("0")
+        bank.fetch_question_by_id("1").disable()
+        bank.fetch_question_by_id("2").question_text = "Edited"
+    # the snapshot cache sees the logged edits too
+    for bank in (QuestionBankLog(file_manager).open_bank(), BankSnapshotCache(file_manager).load_bank()):
+        assert sorted(question.question_id for question in bank) == ["1", "2", "3"]
+        assert bank.fetch_question_by_id("1").active is False
+        assert bank.fetch_question_by_id("2").question_text == "Edited"
+        assert bank.fetch_question_by_id("3").options == ["yes", "no"]
+    with QuestionBankLog(file_manager) as log:
+        bank = log.open_bank()
+        log.compact()
+        # compaction writes the edits back to the questions file
+        assert [question.question_id for question in file_manager.load_questions()] == ["1", "2", "3"]
+        assert len(log.segments()) == 1
+        bank.fetch_question_by_id("1").enable()
+    # a torn line left by a crash is ignored
+    with open(log.segments()[-1], mode="a") as file:
+        file.write('["remove", "3"')
+    with QuestionBankLog(file_manager) as log:
+        bank = log.open_bank()
+        assert len(bank) == 3 and bank.fetch_question_by_id("1").active is True
+
+
+def test_question_bank_log_follows_questions_file(file_manager):
+    file_manager.save_questions([Question("1", "Question 1", "yes")])
+    with QuestionBankLog(file_manager) as log:
+        log.open_bank().fetch_question_by_id("1").disable()
+    # a hand-edited questions file replaces the snapshot; the log is
+    # replayed on top of it
+    file_manager.save_questions([Question("1", "Question 1", "yes"), Question("2", "Question 2", "no")])
+    with QuestionBankLog(file_manager) as log:
+        bank = log.open_bank()
+        assert sorted(question.question_id for question in bank) == ["1", "2"]
+        assert bank.fetch_question_by_id("1").active is False
+
+
+def test_test_forms_respect_constraints():
+    questions = [Question(str(i), f"Question {i}", "yes") for i in range(200)]
+    for i, question in enumerate(questions):
+        question.times_shown = 10
+        question.times_answered_correctly = i % 11
+    forms = FormGenerator(questions, form_size=20, max_overlap=3, seed=7)
+    form_ids = forms.generate(40)
+    assert len(forms) == 40 and forms.max_shared() <= 3
+    for form_id in form_ids:
+        form = forms.form(form_id)
+        assert len({question.question_id for question in form}) == 20
+        # five questions from each of the four difficulty bands
+        accuracies = sorted(question.times_answered_correctly for question in form)
+        assert accuracies[0] <= 2 and accuracies[-1] >= 8
+    again = FormGenerator(questions, form_size=20, max_overlap=3, seed=7)
+    again.generate(40)
+    assert [q.question_id for q in again.form("form-5")] == [q.question_id for q in forms.form("form-5")]
+    # a failed attempt leaves the band queues as they were
+    limited = FormGenerator(questions[:30], form_size=20, max_overlap=0, seed=2)
+    limited.generate(1)
+    bands = [list(band) for band in limited._strata]
+    with pytest.raises(ValueError):
+        limited.generate(1)
+    assert [list(band) for band in limited._strata] == bands
+    assert len(limited) == 1
+
+
+def test_start_test_mode_with_form():
+    questions = [Question(str(i), f"Question {i}", "yes") for i in range(10)]
+    forms = FormGenerator(questions, form_size=4, seed=1)
+    form_id, = forms.generate(1)
+    session = PracticeTestSession(questions, forms=forms)
+    session.start_test_mode(form_id=form_id)
+    assert session.questions == forms.form(form_id)
+    session.start_test_mode(6)
+    assert len(session.questions) == 6
+    session.start_test_mode(20)
+    assert len(session.questions) == 10
+    with pytest.raises(ValueError):
+        PracticeTestSession(questions).start_test_mode(form_id=form_id)
+
+
+def test_response_log_spills_and_analyses(tmp_path, question_bank):
+    question_bank.add_many([Question(str(i), f"Question {i}", "yes") for i in range(4)])
+    log = ResponseLog(str(tmp_path / "responses"), chunk_size=5)
+    rng = random.Random(3)
+    expected = []
+    for user in ("ann", "bob", "cid"):
+        quiz = QuizManager(question_bank, user_id=user, response_log=log)
+        question = quiz.start_quiz(seed=rng.random())
+        while question is not None:
+            answer = "yes" if rng.random() < 0.6 else "no"
+            expected.append((question.question_id, user, answer == "yes"))
+            quiz.evaluate_answer(question, answer)
+            question = quiz.select_next_question()
+    log.close()
+    reopened = ResponseLog(str(tmp_path / "responses"))
+    assert len(reopened) == 12
+    analysis = ItemAnalysis(reopened)
+    for user in ("ann", "bob", "cid"):
+        answers = [right for _, who, right in expected if who == user]
+        assert analysis.user_accuracy[user] == sum(answers) / len(answers)
+    for question_id in "0123":
+        rows = [(right, analysis.user_accuracy[who]) for qid, who, right in expected if qid == question_id]
+        assert analysis.difficulty[question_id] == sum(right for right, _ in rows) / len(rows)
+        rights = [float(right) for right, _ in rows]
+        scores = [score for _, score in rows]
+        if len(set(rights)) > 1 and len(set(scores)) > 1:
+            assert analysis.discrimination[question_id] == pytest.approx(
+                statistics.correlation(rights, scores))
+        else:
+            assert analysis.discrimination[question_id] == 0.0
+
+
+def test_sharded_grader_matches_single_process(file_manager, question_bank):
+    questions = [Question(str(i), f"Question {i}", f"answer {i}") for i in range(20)]
+    file_manager.save_questions_binary(questions)
+    question_bank.add_many(questions)
+    rng = random.Random(5)
+    submissions = [(f"user{rng.randrange(7)}", str(question), f"answer {rng.choice((question, 0))}")
+                   for question in (rng.randrange(20) for _ in range(300))]
+    with ShardedGrader(file_manager.questions_binary_file, shards=3) as grader:
+        results = grader.grade(submissions)
+        grader.record_test("user1", "t1", 80, completion_time=30.0)
+        # an unknown question fails the batch without counting anything
+        with pytest.raises(KeyError):
+            grader.grade([("user1", "missing", "x")])
+        summary, counts = grader.summary()
+        user = grader.user_summary("user1")
+    assert list(results) == list(question_bank.grade_answers(
+        (question_id, answer) for _, question_id, answer in submissions))
+    assert summary.correct_answers == sum(results)
+    assert summary.correct_answers + summary.incorrect_answers == 300
+    assert summary.scores.mean == 80
+    assert counts == {question.question_id: (question.times_shown, question.times_answered_correctly)
+                      for question in question_bank if question.times_shown}
+    assert user.correct_answers == sum(correct for (who, _, _), correct in zip(submissions, results)
+                                       if who == "user1")